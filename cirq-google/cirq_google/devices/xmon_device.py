@@ -12,7 +12,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Any, cast, Iterable, List, Optional, Set, TYPE_CHECKING, FrozenSet
+import functools
+from typing import (
+    Any,
+    Callable,
+    cast,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TYPE_CHECKING,
+    FrozenSet,
+)
 
 import cirq
 from cirq_google.optimizers import convert_to_xmon_gates
@@ -20,11 +33,52 @@ from cirq_google.optimizers import convert_to_xmon_gates
 if TYPE_CHECKING:
     import cirq
 
+# The converter holds no per-operation state, so a single instance is shared.
+_XMON_CONVERTER = convert_to_xmon_gates.ConvertToXmonGates()
+
+_SUPPORTED_GATES = (
+    cirq.CZPowGate,
+    cirq.XPowGate,
+    cirq.YPowGate,
+    cirq.PhasedXPowGate,
+    cirq.MeasurementGate,
+    cirq.ZPowGate,
+)
+
+
+# Circuits reuse a handful of gate types, so the subclass check is cached per
+# type. The bound keeps gate classes created at runtime from being held forever.
+@functools.lru_cache(maxsize=128)
+def _is_supported_gate_type(gate_type: type) -> bool:
+    return issubclass(gate_type, _SUPPORTED_GATES)
+
+
+# Supported gates that never conflict with a simultaneous adjacent CZ.
+_NON_INTERACTING_GATES = (
+    cirq.XPowGate,
+    cirq.YPowGate,
+    cirq.PhasedXPowGate,
+    cirq.MeasurementGate,
+    cirq.ZPowGate,
+)
+_NON_INTERACTING_GATE_TYPES = frozenset(_NON_INTERACTING_GATES)
+
 
 @cirq.value_equality
 class XmonDevice(cirq.Device):
     """A device with qubits placed in a grid. Neighboring qubits can interact."""
 
+    # Maps each supported gate type to the device duration it takes.
+    _DURATION_DISPATCH: Dict[type, Callable[['XmonDevice'], cirq.Duration]] = {
+        cirq.CZPowGate: lambda self: self._exp_z_duration,
+        cirq.MeasurementGate: lambda self: self._measurement_duration,
+        cirq.XPowGate: lambda self: self._exp_w_duration,
+        cirq.YPowGate: lambda self: self._exp_w_duration,
+        cirq.PhasedXPowGate: lambda self: self._exp_w_duration,
+        # Z gates are performed in the control software.
+        cirq.ZPowGate: lambda self: cirq.Duration(),
+    }
+
     def __init__(
         self,
         measurement_duration: cirq.DURATION_LIKE,
@@ -39,54 +93,75 @@ class XmonDevice(cirq.Device):
             exp_w_duration: The maximum duration of an ExpW operation.
             exp_11_duration: The maximum duration of an ExpZ operation.
             qubits: Qubits on the device, identified by their x, y location.
+
+        Raises:
+            ValueError: One of the qubits is not a `cirq.GridQubit`.
         """
-        self._measurement_duration = cirq.Duration(measurement_duration)
-        self._exp_w_duration = cirq.Duration(exp_w_duration)
-        self._exp_z_duration = cirq.Duration(exp_11_duration)
-        self.qubits = frozenset(qubits)
+        self._measurement_duration: cirq.Duration = cirq.Duration(measurement_duration)
+        self._exp_w_duration: cirq.Duration = cirq.Duration(exp_w_duration)
+        self._exp_z_duration: cirq.Duration = cirq.Duration(exp_11_duration)
+        # Canonical qubit instance for each position. Qubits handed out by the
+        # device are the instances in `self.qubits`, so lookups of them
+        # short-circuit on identity.
+        self._qubit_by_coord: Dict[Tuple[int, int], cirq.GridQubit] = {}
+        for q in qubits:
+            if not isinstance(q, cirq.GridQubit):
+                raise ValueError(f'Unsupported qubit type: {q!r}')
+            self._qubit_by_coord[q.row, q.col] = q
+        self.qubits = frozenset(self._qubit_by_coord.values())
+        self._neighbors: Dict[cirq.GridQubit, Tuple[cirq.GridQubit, ...]] = {
+            q: self._grid_neighbors(q) for q in self.qubits
+        }
+        self._rows: Dict[int, List[cirq.GridQubit]] = {}
+        self._cols: Dict[int, List[cirq.GridQubit]] = {}
+        for q in self.qubits:
+            self._rows.setdefault(q.row, []).append(q)
+            self._cols.setdefault(q.col, []).append(q)
+        for line in [*self._rows.values(), *self._cols.values()]:
+            line.sort()
+        # Computed on first use by `__repr__`.
+        self._sorted_qubits: Optional[List[cirq.GridQubit]] = None
 
     def qubit_set(self) -> FrozenSet[cirq.GridQubit]:
         return self.qubits
 
     def decompose_operation(self, operation: cirq.Operation) -> cirq.OP_TREE:
-        return convert_to_xmon_gates.ConvertToXmonGates().convert(operation)
+        return _XMON_CONVERTER.convert(operation)
 
     def neighbors_of(self, qubit: cirq.GridQubit):
         """Returns the qubits that the given qubit can interact with."""
+        neighbors = self._neighbors.get(qubit)
+        if neighbors is None:
+            neighbors = self._grid_neighbors(qubit)
+        return list(neighbors)
+
+    def _grid_neighbors(self, qubit: cirq.GridQubit) -> Tuple[cirq.GridQubit, ...]:
+        r, c = qubit.row, qubit.col
         possibles = [
-            cirq.GridQubit(qubit.row + 1, qubit.col),
-            cirq.GridQubit(qubit.row - 1, qubit.col),
-            cirq.GridQubit(qubit.row, qubit.col + 1),
-            cirq.GridQubit(qubit.row, qubit.col - 1),
+            self._qubit_by_coord.get((r + 1, c)),
+            self._qubit_by_coord.get((r - 1, c)),
+            self._qubit_by_coord.get((r, c + 1)),
+            self._qubit_by_coord.get((r, c - 1)),
         ]
-        return [e for e in possibles if e in self.qubits]
+        return tuple(e for e in possibles if e is not None)
 
     def duration_of(self, operation):
-        if isinstance(operation.gate, cirq.CZPowGate):
-            return self._exp_z_duration
-        if isinstance(operation.gate, cirq.MeasurementGate):
-            return self._measurement_duration
-        if isinstance(operation.gate, (cirq.XPowGate, cirq.YPowGate, cirq.PhasedXPowGate)):
-            return self._exp_w_duration
-        if isinstance(operation.gate, cirq.ZPowGate):
-            # Z gates are performed in the control software.
-            return cirq.Duration()
-        raise ValueError(f'Unsupported gate type: {operation!r}')
+        gate_type = type(operation.gate)
+        duration_fn = self._DURATION_DISPATCH.get(gate_type)
+        if duration_fn is None:
+            # Fall back to a subclass check, e.g. for `cirq.X` or `cirq.Rz`.
+            for base, fn in self._DURATION_DISPATCH.items():
+                if issubclass(gate_type, base):
+                    duration_fn = fn
+                    break
+            else:
+                raise ValueError(f'Unsupported gate type: {operation!r}')
+        return duration_fn(self)
 
     @classmethod
     def is_supported_gate(cls, gate: cirq.Gate):
         """Returns true if the gate is allowed."""
-        return isinstance(
-            gate,
-            (
-                cirq.CZPowGate,
-                cirq.XPowGate,
-                cirq.YPowGate,
-                cirq.PhasedXPowGate,
-                cirq.MeasurementGate,
-                cirq.ZPowGate,
-            ),
-        )
+        return _is_supported_gate_type(type(gate))
 
     def validate_gate(self, gate: cirq.Gate):
         """Raises an error if the given gate isn't allowed.
@@ -98,65 +173,99 @@ class XmonDevice(cirq.Device):
             raise ValueError(f'Unsupported gate type: {gate!r}')
 
     def validate_operation(self, operation: cirq.Operation):
-        if not isinstance(operation, cirq.GateOperation):
+        # The `type(...) is` checks are fast paths; `isinstance` handles subclasses.
+        if type(operation) is not cirq.GateOperation and not isinstance(
+            operation, cirq.GateOperation
+        ):
             raise ValueError(f'Unsupported operation: {operation!r}')
 
-        self.validate_gate(operation.gate)
+        gate = cast(cirq.GateOperation, operation).gate
+        self.validate_gate(gate)
 
-        for q in operation.qubits:
-            if not isinstance(q, cirq.GridQubit):
+        qubits = operation.qubits
+        device_qubits = self.qubits
+        for q in qubits:
+            if type(q) is not cirq.GridQubit and not isinstance(q, cirq.GridQubit):
                 raise ValueError(f'Unsupported qubit type: {q!r}')
-            if q not in self.qubits:
+            if q not in device_qubits:
                 raise ValueError(f'Qubit not on device: {q!r}')
 
-        if len(operation.qubits) == 2 and not isinstance(operation.gate, cirq.MeasurementGate):
-            p, q = operation.qubits
-            if not cast(cirq.GridQubit, p).is_adjacent(q):
+        if len(qubits) == 2 and not (
+            type(gate) is cirq.MeasurementGate or isinstance(gate, cirq.MeasurementGate)
+        ):
+            p, q = cast(Tuple[cirq.GridQubit, cirq.GridQubit], qubits)
+            if abs(p.row - q.row) + abs(p.col - q.col) != 1:
                 raise ValueError(f'Non-local interaction: {operation!r}.')
 
     def _check_if_exp11_operation_interacts_with_any(
         self, exp11_op: cirq.GateOperation, others: Iterable[cirq.GateOperation]
     ) -> bool:
-        return any(self._check_if_exp11_operation_interacts(exp11_op, op) for op in others)
+        candidates = [op for op in others if _may_interact(op)]
+        if not candidates:
+            # Nothing to check, so don't look at the qubits of exp11_op.
+            return False
+        exp11_qubits = _grid_qubits(exp11_op)
+        device_qubits = self.qubits
+        on_device = all(q in device_qubits for q in exp11_qubits)
+        neighbors: FrozenSet[cirq.GridQubit] = frozenset()
+        if on_device:
+            neighbors = frozenset(n for q in exp11_qubits for n in self._neighbors[q])
+        for op in candidates:
+            for p in _grid_qubits(op):
+                if on_device and p in device_qubits:
+                    # Adjacent on-device qubits are exactly the precomputed neighbors.
+                    if p in neighbors:
+                        return True
+                elif any(abs(p.row - q.row) + abs(p.col - q.col) == 1 for q in exp11_qubits):
+                    return True
+        return False
 
     def _check_if_exp11_operation_interacts(
         self, exp11_op: cirq.GateOperation, other_op: cirq.GateOperation
     ) -> bool:
-        if isinstance(
-            other_op.gate,
-            (
-                cirq.XPowGate,
-                cirq.YPowGate,
-                cirq.PhasedXPowGate,
-                cirq.MeasurementGate,
-                cirq.ZPowGate,
-            ),
-        ):
-            return False
-
-        return any(
-            cast(cirq.GridQubit, q).is_adjacent(cast(cirq.GridQubit, p))
-            for q in exp11_op.qubits
-            for p in other_op.qubits
-        )
+        return self._check_if_exp11_operation_interacts_with_any(exp11_op, [other_op])
 
     def validate_circuit(self, circuit: cirq.Circuit):
-        super().validate_circuit(circuit)
+        # Equivalent to validating each moment, but validates the operations
+        # and collects the CZs of each moment in a single pass.
+        for moment in circuit:
+            cz_ops = []
+            for op in moment.operations:
+                self.validate_operation(op)
+                if _is_cz_gate(op.gate):
+                    cz_ops.append(op)
+            self._validate_cz_adjacency(moment, cz_ops)
         _verify_unique_measurement_keys(circuit.all_operations())
 
     def validate_moment(self, moment: cirq.Moment):
         super().validate_moment(moment)
-        for op in moment.operations:
-            if isinstance(op.gate, cirq.CZPowGate):
-                for other in moment.operations:
-                    if other is not op and self._check_if_exp11_operation_interacts(
-                        cast(cirq.GateOperation, op), cast(cirq.GateOperation, other)
-                    ):
+        self._validate_cz_adjacency(
+            moment, [op for op in moment.operations if _is_cz_gate(op.gate)]
+        )
+
+    def _validate_cz_adjacency(self, moment: cirq.Moment, cz_ops: List[cirq.Operation]):
+        """Raises an error if any of the given CZs of the moment are adjacent.
+
+        Only CZs interact with their neighbors, so it suffices to look up the
+        grid neighbors of each CZ in a map of the qubits touched by CZs.
+        """
+        if len(cz_ops) < 2:
+            return
+        occupied = {q: op for op in cz_ops for q in op.qubits}
+        for op in cz_ops:
+            for q in op.qubits:
+                for neighbor in self._neighbors[cast(cirq.GridQubit, q)]:
+                    other = occupied.get(neighbor)
+                    if other is not None and other is not op:
                         raise ValueError(f'Adjacent Exp11 operations: {moment}.')
 
     def can_add_operation_into_moment(self, operation: cirq.Operation, moment: cirq.Moment) -> bool:
-        self.validate_moment(moment)
+        """Determines if it's possible to add an operation into a moment.
 
+        The moment is assumed to already be valid for this device (e.g. via
+        `validate_moment`) and is not revalidated. Only the interactions of
+        the new operation with the operations in the moment are checked.
+        """
         if not super().can_add_operation_into_moment(operation, moment):
             return False
         if isinstance(operation.gate, cirq.CZPowGate):
@@ -168,33 +277,36 @@ class XmonDevice(cirq.Device):
 
     def at(self, row: int, col: int) -> Optional[cirq.GridQubit]:
         """Returns the qubit at the given position, if there is one, else None."""
-        q = cirq.GridQubit(row, col)
-        return q if q in self.qubits else None
+        return self._qubit_by_coord.get((row, col))
 
     def row(self, row: int) -> List[cirq.GridQubit]:
         """Returns the qubits in the given row, in ascending order."""
-        return sorted(q for q in self.qubits if q.row == row)
+        return list(self._rows.get(row, ()))
 
     def col(self, col: int) -> List[cirq.GridQubit]:
         """Returns the qubits in the given column, in ascending order."""
-        return sorted(q for q in self.qubits if q.col == col)
+        return list(self._cols.get(col, ()))
 
     def __repr__(self) -> str:
+        if self._sorted_qubits is None:
+            self._sorted_qubits = sorted(self.qubits)
         return (
             'XmonDevice('
             f'measurement_duration={self._measurement_duration!r}, '
             f'exp_w_duration={self._exp_w_duration!r}, '
             f'exp_11_duration={self._exp_z_duration!r} '
-            f'qubits={sorted(self.qubits)!r})'
+            f'qubits={self._sorted_qubits!r})'
         )
 
     def __str__(self) -> str:
         diagram = cirq.TextDiagramDrawer()
 
-        for q in self.qubits:
+        for q, neighbors in self._neighbors.items():
             diagram.write(q.col, q.row, str(q))
-            for q2 in self.neighbors_of(q):
-                diagram.grid_line(q.col, q.row, q2.col, q2.row)
+            for q2 in neighbors:
+                # Draw each edge once, from its smaller endpoint.
+                if q < q2:
+                    diagram.grid_line(q.col, q.row, q2.col, q2.row)
 
         return diagram.render(horizontal_spacing=3, vertical_spacing=2, use_unicode_characters=True)
 
@@ -202,11 +314,41 @@ class XmonDevice(cirq.Device):
         return (self._measurement_duration, self._exp_w_duration, self._exp_z_duration, self.qubits)
 
 
+def _grid_qubits(op: cirq.Operation) -> Tuple[cirq.GridQubit, ...]:
+    for q in op.qubits:
+        if not isinstance(q, cirq.GridQubit):
+            raise ValueError(f'Unsupported qubit type: {q!r}')
+    return cast(Tuple[cirq.GridQubit, ...], op.qubits)
+
+
+def _may_interact(op: cirq.Operation) -> bool:
+    gate = op.gate
+    return not (
+        type(gate) in _NON_INTERACTING_GATE_TYPES or isinstance(gate, _NON_INTERACTING_GATES)
+    )
+
+
+def _is_cz_gate(gate: Optional[cirq.Gate]) -> bool:
+    return type(gate) is cirq.CZPowGate or isinstance(gate, cirq.CZPowGate)
+
+
+def _measurement_key_or_none(op: cirq.Operation) -> Optional[str]:
+    gate = getattr(op, 'gate', None)
+    if type(gate) is cirq.MeasurementGate:
+        # Fast path that skips protocol dispatch for plain measurements.
+        return gate.key
+    if cirq.is_measurement(op):
+        return cirq.measurement_key(op)
+    return None
+
+
 def _verify_unique_measurement_keys(operations: Iterable[cirq.Operation]):
+    keys = [key for key in map(_measurement_key_or_none, operations) if key is not None]
+    if len(set(keys)) == len(keys):
+        return
+    # Slow path, only taken on failure, to report the first repeated key.
     seen: Set[str] = set()
-    for op in operations:
-        if cirq.is_measurement(op):
-            key = cirq.measurement_key(op)
-            if key in seen:
-                raise ValueError(f'Measurement key {key} repeated')
-            seen.add(key)
+    for key in keys:
+        if key in seen:
+            raise ValueError(f'Measurement key {key} repeated')
+        seen.add(key)
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import pickle
+
 import pytest
 
 import cirq
@@ -55,10 +57,18 @@ def test_init():
     assert d.duration_of(cirq.measure(q00, q01)) == ns
     assert d.duration_of(cirq.X(q00)) == 2 * ns
     assert d.duration_of(cirq.CZ(q00, q01)) == 3 * ns
+    assert d.duration_of(cirq.PhasedXPowGate(phase_exponent=0.25).on(q00)) == 2 * ns
+    assert d.duration_of(cirq.rz(0.5).on(q00)) == 0 * ns
     with pytest.raises(ValueError):
         _ = d.duration_of(cirq.SingleQubitGate().on(q00))
 
 
+def test_init_non_grid_qubits():
+    ns = cirq.Duration(nanos=1)
+    with pytest.raises(ValueError, match='Unsupported qubit type'):
+        _ = cg.XmonDevice(ns, ns, ns, qubits=[cirq.GridQubit(0, 0), cirq.LineQubit(0)])
+
+
 def test_init_timedelta():
     from datetime import timedelta
 
@@ -105,6 +115,46 @@ def test_can_add_operation_into_moment():
     q11 = cirq.GridQubit(1, 1)
     m = cirq.Moment([cirq.CZ(q00, q01)])
     assert not d.can_add_operation_into_moment(cirq.CZ(q10, q11), m)
+    assert not d.can_add_operation_into_moment(cirq.X(q00), m)
+    assert d.can_add_operation_into_moment(cirq.X(q10), m)
+
+    d = square_device(3, 3)
+    q20 = cirq.GridQubit(2, 0)
+    q21 = cirq.GridQubit(2, 1)
+    assert d.can_add_operation_into_moment(cirq.CZ(q20, q21), m)
+    assert d.can_add_operation_into_moment(cirq.CZ(q10, q11), cirq.Moment([cirq.X(q00)]))
+
+    # Neighbors are only looked up when there is an operation to check them against.
+    a, b, c = cirq.LineQubit.range(3)
+    assert d.can_add_operation_into_moment(cirq.CZ(a, b), cirq.Moment())
+    assert d.can_add_operation_into_moment(cirq.CZ(a, b), cirq.Moment([cirq.X(c)]))
+
+    # Interacting operations on unsupported qubits are rejected.
+    e = cirq.LineQubit(3)
+    with pytest.raises(ValueError, match='Unsupported qubit type'):
+        d.can_add_operation_into_moment(cirq.CZ(a, b), cirq.Moment([cirq.CZ(c, e)]))
+    with pytest.raises(ValueError, match='Unsupported qubit type'):
+        d.can_add_operation_into_moment(cirq.CZ(a, b), cirq.Moment([cirq.CNOT(q00, q01)]))
+
+    # Off-device qubits are compared by grid distance.
+    q22 = cirq.GridQubit(2, 2)
+    q31 = cirq.GridQubit(3, 1)
+    q32 = cirq.GridQubit(3, 2)
+    assert not d.can_add_operation_into_moment(cirq.CZ(q21, q22), cirq.Moment([cirq.CZ(q31, q32)]))
+    assert not d.can_add_operation_into_moment(cirq.CZ(q31, q32), cirq.Moment([cirq.CZ(q21, q22)]))
+    assert d.can_add_operation_into_moment(cirq.CZ(q00, q01), cirq.Moment([cirq.CZ(q31, q32)]))
+    assert not d.can_add_operation_into_moment(
+        cirq.CZ(q00, q01), cirq.Moment([cirq.CNOT(q10, q11)])
+    )
+
+
+def test_can_add_operation_into_moment_assumes_valid_moment():
+    d = square_device(2, 2)
+    invalid = cirq.Moment([cirq.X(cirq.LineQubit(0))])
+    with pytest.raises(ValueError, match='Unsupported qubit type'):
+        d.validate_moment(invalid)
+    # The moment itself is not revalidated.
+    assert d.can_add_operation_into_moment(cirq.X(cirq.GridQubit(0, 0)), invalid)
 
 
 def test_validate_moment():
@@ -117,6 +167,15 @@ def test_validate_moment():
     with pytest.raises(ValueError):
         d.validate_moment(m)
 
+    d = square_device(3, 3)
+    q02 = cirq.GridQubit(0, 2)
+    q20 = cirq.GridQubit(2, 0)
+    q21 = cirq.GridQubit(2, 1)
+    d.validate_moment(cirq.Moment([cirq.CZ(q00, q01), cirq.CZ(q20, q21)]))
+    d.validate_moment(cirq.Moment([cirq.CZ(q00, q01), cirq.X(q02), cirq.measure(q10, q11)]))
+    with pytest.raises(ValueError, match='Adjacent Exp11 operations'):
+        d.validate_moment(cirq.Moment([cirq.CZ(q00, q01), cirq.CZ(q02, cirq.GridQubit(1, 2))]))
+
 
 def test_validate_operation_adjacent_qubits():
     d = square_device(3, 3)
@@ -167,6 +226,33 @@ def test_validate_operation_supported_gate():
         d.validate_operation(NotImplementedOperation())
 
 
+def test_is_supported_gate():
+    class MyXPowGate(cirq.XPowGate):
+        pass
+
+    # Checked twice, so that the second check is answered from the per-type cache.
+    for _ in range(2):
+        assert cg.XmonDevice.is_supported_gate(cirq.X)
+        assert cg.XmonDevice.is_supported_gate(cirq.CZ)
+        assert cg.XmonDevice.is_supported_gate(MyXPowGate())
+        assert not cg.XmonDevice.is_supported_gate(cirq.H)
+        assert not cg.XmonDevice.is_supported_gate(cirq.CNOT)
+
+
+def test_validate_circuit():
+    d = square_device(3, 3)
+    q00 = cirq.GridQubit(0, 0)
+    q01 = cirq.GridQubit(0, 1)
+    q10 = cirq.GridQubit(1, 0)
+    q11 = cirq.GridQubit(1, 1)
+
+    d.validate_circuit(cirq.Circuit([cirq.Moment([cirq.CZ(q00, q01), cirq.X(q10)])]))
+    with pytest.raises(ValueError, match='Adjacent Exp11 operations'):
+        d.validate_circuit(cirq.Circuit([cirq.Moment([cirq.CZ(q00, q01), cirq.CZ(q10, q11)])]))
+    with pytest.raises(ValueError, match='Qubit not on device'):
+        d.validate_circuit(cirq.Circuit([cirq.Moment([cirq.X(cirq.GridQubit(5, 5))])]))
+
+
 def test_validate_circuit_repeat_measurement_keys():
     d = square_device(3, 3)
 
@@ -178,6 +264,17 @@ def test_validate_circuit_repeat_measurement_keys():
     with pytest.raises(ValueError, match='Measurement key a repeated'):
         d.validate_circuit(circuit)
 
+    q00, q01, q02 = cirq.GridQubit.rect(1, 3)
+    d.validate_circuit(cirq.Circuit(cirq.measure(q00, key='a'), cirq.measure(q01, key='b')))
+    circuit = cirq.Circuit(
+        cirq.measure(q00, key='a'),
+        cirq.measure(q01, key='b'),
+        cirq.Moment([cirq.measure(q02, key='b')]),
+        cirq.Moment([cirq.measure(q00, key='a')]),
+    )
+    with pytest.raises(ValueError, match='Measurement key b repeated'):
+        d.validate_circuit(circuit)
+
 
 def test_xmon_device_eq():
     eq = cirq.testing.EqualsTester()
@@ -195,6 +292,15 @@ def test_xmon_device_eq():
     )
 
 
+def test_xmon_device_pickle():
+    d = square_device(3, 3, holes=[cirq.GridQubit(1, 1)])
+    for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+        d2 = pickle.loads(pickle.dumps(d, protocol=protocol))
+        assert d2 == d
+        assert d2.neighbors_of(cirq.GridQubit(0, 0)) == d.neighbors_of(cirq.GridQubit(0, 0))
+        assert d2.row(1) == d.row(1)
+
+
 def test_xmon_device_str():
     assert (
         str(square_device(2, 2)).strip()
@@ -224,6 +330,37 @@ def test_at():
     assert d.at(1, 2) == cirq.GridQubit(1, 2)
     assert d.at(1, 3) is None
 
+    d = square_device(3, 3, holes=[cirq.GridQubit(1, 1)])
+    assert d.at(1, 1) is None
+    assert d.at(1, 2) == cirq.GridQubit(1, 2)
+
+    d = square_device(0, 0)
+    assert d.at(0, 0) is None
+
+    ns = cirq.Duration(nanos=1)
+    far = cirq.GridQubit(10 ** 6, 10 ** 6)
+    d = cg.XmonDevice(ns, ns, ns, qubits=[cirq.GridQubit(0, 0), far])
+    assert d.at(10 ** 6, 10 ** 6) == far
+    assert d.at(1, 1) is None
+    assert d.neighbors_of(cirq.GridQubit(0, 0)) == []
+
+
+def test_neighbors_of():
+    d = square_device(3, 3, holes=[cirq.GridQubit(1, 1)])
+    assert set(d.neighbors_of(cirq.GridQubit(0, 0))) == {cirq.GridQubit(0, 1), cirq.GridQubit(1, 0)}
+    assert set(d.neighbors_of(cirq.GridQubit(0, 1))) == {cirq.GridQubit(0, 0), cirq.GridQubit(0, 2)}
+    assert set(d.neighbors_of(cirq.GridQubit(1, 1))) == {
+        cirq.GridQubit(0, 1),
+        cirq.GridQubit(1, 0),
+        cirq.GridQubit(1, 2),
+        cirq.GridQubit(2, 1),
+    }
+    assert d.neighbors_of(cirq.GridQubit(5, 5)) == []
+
+    device_qubits = {id(q) for q in d.qubits}
+    assert all(id(q) in device_qubits for q in d.neighbors_of(cirq.GridQubit(0, 0)))
+    assert id(d.at(0, 0)) in device_qubits
+
 
 def test_row_and_col():
     d = square_device(2, 3)
@@ -239,6 +376,11 @@ def test_row_and_col():
     assert d.row(2) == [cirq.GridQubit(2, 0), cirq.GridQubit(2, 1)]
     assert d.row(3) == []
 
+    d.row(0).clear()
+    d.col(0).clear()
+    assert d.row(0) == [cirq.GridQubit(0, 0), cirq.GridQubit(0, 1)]
+    assert d.col(0) == [cirq.GridQubit(0, 0), cirq.GridQubit(1, 0), cirq.GridQubit(2, 0)]
+
     b = cg.Bristlecone
     assert b.col(0) == [cirq.GridQubit(5, 0)]
     assert b.row(0) == [cirq.GridQubit(0, 5), cirq.GridQubit(0, 6)]
@@ -20,6 +20,8 @@ from cirq_google.optimizers import optimized_for_sycamore
 if TYPE_CHECKING:
     import cirq_google
 
+_XMON_OPTIMIZER_TYPES = {True: 'xmon_partial_cz', False: 'xmon'}
+
 
 def optimized_for_xmon(
     circuit: cirq.Circuit,
@@ -27,11 +29,9 @@ def optimized_for_xmon(
     qubit_map: Callable[[cirq.Qid], cirq.GridQubit] = lambda e: cast(cirq.GridQubit, e),
     allow_partial_czs: bool = False,
 ) -> cirq.Circuit:
-    if allow_partial_czs:
-        return optimized_for_sycamore(
-            circuit, new_device=new_device, qubit_map=qubit_map, optimizer_type='xmon_partial_cz'
-        )
-    else:
-        return optimized_for_sycamore(
-            circuit, new_device=new_device, qubit_map=qubit_map, optimizer_type='xmon'
-        )
+    return optimized_for_sycamore(
+        circuit,
+        new_device=new_device,
+        qubit_map=qubit_map,
+        optimizer_type=_XMON_OPTIMIZER_TYPES[bool(allow_partial_czs)],
+    )